@@ -0,0 +1,247 @@
+"""
+Cold storage for old games.
+
+Games untouched for ARCHIVE_AFTER_DAYS are moved in batches from the games
+table to archived_games, with the narrative history stored as a single
+compressed blob (zstd when installed, gzip otherwise). Archived games are
+rehydrated on read and kept in a small cache shared by the workers, and moved back
+to the games table as soon as the player makes a new decision.
+
+Usage:
+    python archive_service.py [--days 30] [--batch-size 200]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from coordination_service import backend as coordination
+from database import SessionLocal
+from models import Game, ArchivedGame
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "200"))
+# Hours between two runs of the background job, 0 disables it
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24"))
+ARCHIVE_CACHE_TTL_SECONDS = 3600
+
+
+# ===== COMPRESSION =====
+
+def compress_history(history: list) -> tuple:
+    """Return (codec, blob, raw_size) for a narrative history"""
+    raw = json.dumps(history, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=19).compress(raw), len(raw)
+    return "gzip", gzip.compress(raw, compresslevel=9), len(raw)
+
+
+def decompress_history(codec: str, blob: bytes) -> list:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this archived game")
+        raw = zstandard.ZstdDecompressor().decompress(blob)
+    else:
+        raw = gzip.decompress(blob)
+    return json.loads(raw)
+
+
+# ===== HOT CACHE =====
+
+class ArchiveCache:
+    """
+    Cache of rehydrated archived games: game_id -> game dict.
+    Entries live in the coordination backend so every worker sees evictions.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    def get(self, game_id: int) -> Optional[Dict[str, Any]]:
+        value = coordination.cache_get(f"archive:{game_id}")
+        return json.loads(value) if value is not None else None
+
+    def put(self, game_id: int, game: Dict[str, Any]) -> None:
+        coordination.cache_set(f"archive:{game_id}", json.dumps(game, ensure_ascii=False).encode("utf-8"), self.ttl)
+
+    def evict(self, game_id: int) -> None:
+        coordination.cache_delete(f"archive:{game_id}")
+
+
+archive_cache = ArchiveCache(ARCHIVE_CACHE_TTL_SECONDS)
+
+
+def get_archived_game(db: Session, game_id: int) -> Optional[Dict[str, Any]]:
+    """Rehydrate an archived game (from the hot cache when possible)"""
+    game = archive_cache.get(game_id)
+    if game is not None:
+        return game
+    archived = db.query(ArchivedGame).filter(ArchivedGame.id == game_id).first()
+    if not archived:
+        return None
+    game = {
+        "id": archived.id,
+        "user_id": archived.user_id,
+        "country": archived.country,
+        "country_code": archived.country_code,
+        "current_date": archived.current_date,
+        "stats": archived.stats,
+        "current_choices": archived.current_choices or [],
+        "narrative_history": decompress_history(archived.history_codec, archived.history_blob),
+        "version": archived.version,
+        "created_at": archived.created_at.isoformat() if archived.created_at else None,
+    }
+    archive_cache.put(game_id, game)
+    return game
+
+
+def restore_game(db: Session, game_id: int) -> Optional[Game]:
+    """Move an archived game back to the games table so it can be played"""
+    archived = db.query(ArchivedGame).filter(ArchivedGame.id == game_id).first()
+    if not archived:
+        return None
+    game = Game(
+        id=archived.id,
+        user_id=archived.user_id,
+        country=archived.country,
+        country_code=archived.country_code,
+        current_date=archived.current_date,
+        stats=archived.stats,
+        narrative_history=decompress_history(archived.history_codec, archived.history_blob),
+        current_choices=archived.current_choices or [],
+        created_at=archived.created_at,
+    )
+    db.delete(archived)
+    db.add(game)
+    db.flush()
+    # The ORM starts a new row at version 1: restore the archived version so
+    # clients holding it (and their idempotency keys) stay valid. Touching
+    # updated_at keeps the next archival run from moving it straight back.
+    db.query(Game).filter(Game.id == game_id).update(
+        {Game.version: archived.version, Game.updated_at: func.now()}, synchronize_session=False
+    )
+    db.commit()
+    archive_cache.evict(game_id)
+    db.refresh(game)
+    return game
+
+
+def delete_archived_game(db: Session, game_id: int) -> bool:
+    archived = db.query(ArchivedGame).filter(ArchivedGame.id == game_id).first()
+    if not archived:
+        return False
+    db.delete(archived)
+    db.commit()
+    archive_cache.evict(game_id)
+    return True
+
+
+# ===== ARCHIVAL JOB =====
+
+def archive_stale_games(days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Move games untouched for `days` days to the archive, one batch per transaction.
+    Returns counts and the inline vs compressed history sizes.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    stats = {"games": 0, "batches": 0, "raw_bytes": 0, "compressed_bytes": 0}
+    started = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        while True:
+            batch = db.query(Game).filter(
+                func.coalesce(Game.updated_at, Game.created_at) < cutoff
+            ).order_by(Game.id).limit(batch_size).all()
+            if not batch:
+                break
+            for game in batch:
+                codec, blob, raw_size = compress_history(game.narrative_history or [])
+                db.add(ArchivedGame(
+                    id=game.id,
+                    user_id=game.user_id,
+                    country=game.country,
+                    country_code=game.country_code,
+                    current_date=game.current_date,
+                    stats=game.stats,
+                    current_choices=game.current_choices or [],
+                    version=game.version,
+                    history_codec=codec,
+                    history_blob=blob,
+                    history_raw_size=raw_size,
+                    created_at=game.created_at,
+                    updated_at=game.updated_at,
+                ))
+                db.delete(game)
+                stats["raw_bytes"] += raw_size
+                stats["compressed_bytes"] += len(blob)
+            db.commit()
+            stats["games"] += len(batch)
+            stats["batches"] += 1
+    finally:
+        db.close()
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def archive_totals() -> Dict[str, int]:
+    """Overall history sizes in the archive: inline JSON vs compressed blobs"""
+    db = SessionLocal()
+    try:
+        count, raw, compressed = db.query(
+            func.count(ArchivedGame.id),
+            func.coalesce(func.sum(ArchivedGame.history_raw_size), 0),
+            func.coalesce(func.sum(func.length(ArchivedGame.history_blob)), 0),
+        ).one()
+        return {"games": count, "raw_bytes": int(raw), "compressed_bytes": int(compressed)}
+    finally:
+        db.close()
+
+
+def describe_sizes(stats: Dict[str, Any]) -> str:
+    raw, compressed = stats["raw_bytes"], stats["compressed_bytes"]
+    ratio = raw / compressed if compressed else 0.0
+    return (f"{stats['games']} games, history {raw / 1024:.0f} KB -> {compressed / 1024:.0f} KB "
+            f"({ratio:.1f}x smaller)")
+
+
+async def run_periodically() -> None:
+    """Background job started with the API when ARCHIVE_INTERVAL_HOURS > 0"""
+    interval = ARCHIVE_INTERVAL_HOURS * 3600
+    while True:
+        try:
+            # Started by every worker, but only one of them runs each period
+            if not await asyncio.to_thread(coordination.claim, "job:archive", interval):
+                await asyncio.sleep(interval)
+                continue
+            stats = await asyncio.to_thread(archive_stale_games)
+            if stats["games"]:
+                print(f"Archived {describe_sizes(stats)} in {stats['seconds']}s")
+        except Exception as e:
+            print(f"Archival job failed: {e}")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive games untouched for N days")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    codec = "zstd" if zstandard is not None else "gzip"
+    result = archive_stale_games(args.days, args.batch_size)
+    print(f"This run ({codec}, {result['batches']} batches, {result['seconds']}s): {describe_sizes(result)}")
+    print(f"Archive total: {describe_sizes(archive_totals())}")
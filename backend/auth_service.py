@@ -0,0 +1,185 @@
+"""
+Authentication service
+Password hashing with scrypt in a dedicated thread pool, and signed session
+tokens verified without a database round trip.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from fastapi import Header, HTTPException
+
+# Signing key for session tokens. Set it in production so tokens survive restarts
+# and are accepted by every worker.
+AUTH_SECRET = os.getenv("AUTH_SECRET", "")
+# Publicly known values that would let anyone forge a session token
+PLACEHOLDER_SECRETS = {"change-me", "changeme", "secret"}
+if AUTH_SECRET in PLACEHOLDER_SECRETS:
+    raise RuntimeError("AUTH_SECRET is a placeholder, set it to a random value (e.g. `openssl rand -hex 32`)")
+if not AUTH_SECRET and int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+    # Each worker would draw its own random key and reject the others' tokens
+    raise RuntimeError("AUTH_SECRET must be set when running several workers (WEB_CONCURRENCY > 1)")
+if not AUTH_SECRET:
+    print("AUTH_SECRET not set, using a random key: sessions will not survive a restart")
+    AUTH_SECRET = secrets.token_hex(32)
+
+TOKEN_TTL_SECONDS = int(os.getenv("AUTH_TOKEN_TTL", str(7 * 24 * 3600)))
+SESSION_CACHE_SIZE = int(os.getenv("AUTH_SESSION_CACHE_SIZE", "10000"))
+
+# scrypt parameters: 2^14 x 8 x 128 bytes = 16 MB of memory per hash
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Hashing is deliberately slow: keep it off the event loop and cap how many run at once
+_hash_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AUTH_HASH_WORKERS", "2")),
+    thread_name_prefix="auth-hash"
+)
+
+
+# ===== PASSWORD HASHING =====
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=128 * n * r * p + 1024 * 1024)
+
+
+def _hash_password_sync(password: str) -> str:
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def _verify_password_sync(password: str, stored: str) -> bool:
+    if not stored.startswith("scrypt$"):
+        # Legacy unsalted SHA-256 hash, upgraded on next successful login
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored)
+    _, n, r, p, salt, digest = stored.split("$")
+    candidate = _scrypt(password, _b64decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(candidate, _b64decode(digest))
+
+
+# Compared against when the user does not exist, so timing does not reveal it
+_dummy_hash: Optional[str] = None
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password with scrypt and a random salt"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_pool, _hash_password_sync, password)
+
+
+async def verify_password(password: str, stored: Optional[str]) -> bool:
+    """Check a password against a stored hash (scrypt or legacy SHA-256)"""
+    global _dummy_hash
+    loop = asyncio.get_running_loop()
+    if stored is None:
+        if _dummy_hash is None:
+            _dummy_hash = await hash_password(secrets.token_hex(8))
+        await loop.run_in_executor(_hash_pool, _verify_password_sync, password, _dummy_hash)
+        return False
+    return await loop.run_in_executor(_hash_pool, _verify_password_sync, password, stored)
+
+
+def needs_rehash(stored: str) -> bool:
+    """True for hashes made with an older algorithm or weaker parameters"""
+    return not stored.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+
+# ===== SESSION TOKENS =====
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(AUTH_SECRET.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def create_token(user_id: int, username: str) -> str:
+    """Create a signed token carrying the user identity and an expiry"""
+    claims = {"uid": user_id, "name": username, "exp": int(time.time()) + TOKEN_TTL_SECONDS}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}"
+
+
+class SessionCache:
+    """LRU cache of verified tokens: token -> (user, expiry)"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        user, expires = entry
+        if expires < time.time():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return user
+
+    def put(self, token: str, user: Dict[str, Any], expires: int) -> None:
+        self._entries[token] = (user, expires)
+        self._entries.move_to_end(token)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+sessions = SessionCache(SESSION_CACHE_SIZE)
+
+
+def verify_token(token: str) -> Optional[Dict[str, Any]]:
+    """Return {id, username} for a valid, unexpired token, None otherwise"""
+    user = sessions.get(token)
+    if user is not None:
+        return user
+    try:
+        payload, signature = token.split(".")
+        if not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, TypeError):
+        return None
+    if claims.get("exp", 0) < time.time():
+        return None
+    user = {"id": claims["uid"], "username": claims["name"]}
+    sessions.put(token, user, claims["exp"])
+    return user
+
+
+def user_from_header(authorization: Optional[str]) -> Optional[Dict[str, Any]]:
+    """User from an 'Authorization: Bearer <token>' header value, if valid"""
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    return verify_token(authorization[len("Bearer "):])
+
+
+# Async dependencies run on the event loop instead of FastAPI's thread pool
+
+async def get_current_user(authorization: Optional[str] = Header(None)) -> Optional[Dict[str, Any]]:
+    """Dependency: the authenticated user, or None for anonymous requests"""
+    return user_from_header(authorization)
+
+
+async def require_user(authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """Dependency: like get_current_user but rejects anonymous requests"""
+    user = user_from_header(authorization)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Session invalide ou expirée")
+    return user
@@ -0,0 +1,82 @@
+"""
+Cold-start benchmark.
+
+Starts the API in fresh uvicorn processes and measures, for each run, the
+time until /livez answers and until /readyz reports ready, plus the import
+and warm-up durations reported by the app itself.
+
+Usage:
+    python bench_startup.py [--runs 5] [--port 8765] [--timeout 120]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Optional
+
+import httpx
+
+
+def wait_for(url: str, deadline: float, expect_ok: bool = True) -> Optional[httpx.Response]:
+    while time.perf_counter() < deadline:
+        try:
+            response = httpx.get(url, timeout=1.0)
+            if not expect_ok or response.status_code == 200:
+                return response
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def measure_once(port: int, timeout: float) -> Dict[str, Optional[float]]:
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + timeout
+        live = wait_for(f"{base}/livez", deadline)
+        live_at = time.perf_counter() - started if live else None
+        ready = wait_for(f"{base}/readyz", deadline)
+        ready_at = time.perf_counter() - started if ready else None
+        report = (ready or httpx.get(f"{base}/readyz", timeout=1.0)).json() if live else {}
+        return {
+            "live": live_at,
+            "ready": ready_at,
+            "import": report.get("import_seconds"),
+            "warmup": report.get("startup_seconds"),
+        }
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def describe(values) -> str:
+    values = [v for v in values if v is not None]
+    if not values:
+        return "n/a"
+    return f"median {statistics.median(values):.3f}s  min {min(values):.3f}s  max {max(values):.3f}s"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure API cold-start time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for readiness")
+    args = parser.parse_args()
+
+    results = []
+    for run in range(1, args.runs + 1):
+        result = measure_once(args.port, args.timeout)
+        results.append(result)
+        print(f"run {run}: " + ", ".join(
+            f"{key}={value:.3f}s" if value is not None else f"{key}=n/a" for key, value in result.items()
+        ))
+
+    print()
+    for key in ("import", "live", "warmup", "ready"):
+        print(f"{key:<7} {describe(r[key] for r in results)}")
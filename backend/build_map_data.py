@@ -0,0 +1,136 @@
+"""
+Build the bundled world map served by /map/countries/{level}.
+
+Downloads (or reads) the full-resolution countries GeoJSON once, then writes one
+simplified, quantized and precompressed file per level of detail into map_data/.
+
+Usage:
+    python build_map_data.py [--source PATH_OR_URL]
+"""
+import argparse
+import json
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from map_service import MAP_LEVELS, MAP_DATA_DIR, write_level
+
+SOURCE_URL = "https://raw.githubusercontent.com/datasets/geo-countries/master/data/countries.geojson"
+
+
+def _point_segment_distance(p: List[float], a: List[float], b: List[float]) -> float:
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    if dx == 0 and dy == 0:
+        return ((p[0] - a[0]) ** 2 + (p[1] - a[1]) ** 2) ** 0.5
+    t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / (dx * dx + dy * dy)))
+    px, py = a[0] + t * dx, a[1] + t * dy
+    return ((p[0] - px) ** 2 + (p[1] - py) ** 2) ** 0.5
+
+
+def simplify_line(points: List[List[float]], tolerance: float) -> List[List[float]]:
+    """Douglas-Peucker simplification (iterative to avoid deep recursion)"""
+    if len(points) < 3:
+        return points
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        max_dist, index = 0.0, 0
+        for i in range(start + 1, end):
+            dist = _point_segment_distance(points[i], points[start], points[end])
+            if dist > max_dist:
+                max_dist, index = dist, i
+        if max_dist > tolerance:
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def simplify_ring(ring: List[List[float]], tolerance: float, decimals: int) -> Optional[List[List[float]]]:
+    """Simplify and quantize a closed ring, None if it collapses"""
+    result = []
+    for x, y in simplify_line(ring, tolerance):
+        point = [round(x, decimals), round(y, decimals)]
+        if not result or result[-1] != point:
+            result.append(point)
+    if len(result) < 4:
+        return None
+    if result[0] != result[-1]:
+        result.append(result[0])
+    return result
+
+
+def simplify_polygon(polygon: List[List[List[float]]], tolerance: float, decimals: int) -> Optional[list]:
+    exterior = simplify_ring(polygon[0], tolerance, decimals)
+    if exterior is None:
+        return None
+    holes = [simplify_ring(hole, tolerance, decimals) for hole in polygon[1:]]
+    return [exterior] + [hole for hole in holes if hole]
+
+
+def simplify_feature(feature: Dict[str, Any], tolerance: float, decimals: int) -> Optional[Dict[str, Any]]:
+    geometry = feature.get("geometry") or {}
+    if geometry.get("type") == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry.get("type") == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        return None
+
+    simplified = [p for p in (simplify_polygon(poly, tolerance, decimals) for poly in polygons) if p]
+    if not simplified:
+        # Keep small countries visible: fall back to the largest polygon unsimplified
+        largest = max(polygons, key=lambda poly: len(poly[0]))
+        simplified = [simplify_polygon(largest, 0, decimals) or largest]
+
+    props = feature.get("properties", {})
+    properties = {"ADMIN": props.get("ADMIN") or props.get("name") or props.get("NAME") or "Unknown"}
+    # Codes are only written when the source has one, the map falls back on the name otherwise
+    iso_a3 = props.get("ISO_A3") or props.get("ISO3166-1-Alpha-3")
+    iso_a2 = props.get("ISO_A2") or props.get("ISO3166-1-Alpha-2")
+    if iso_a3 and iso_a3 != "-99":
+        properties["ISO_A3"] = iso_a3
+    if iso_a2 and iso_a2 != "-99":
+        properties["ISO_A2"] = iso_a2
+    return {
+        "type": "Feature",
+        "properties": properties,
+        "geometry": {"type": "MultiPolygon", "coordinates": simplified},
+    }
+
+
+def load_source(source: str) -> Dict[str, Any]:
+    if source.startswith("http://") or source.startswith("https://"):
+        print(f"Downloading {source}...")
+        response = httpx.get(source, timeout=300.0, follow_redirects=True)
+        response.raise_for_status()
+        return response.json()
+    with open(source, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build(source: str) -> None:
+    data = load_source(source)
+    features = data.get("features", [])
+    print(f"Loaded {len(features)} features")
+
+    for name, (tolerance, decimals) in MAP_LEVELS.items():
+        simplified = [f for f in (simplify_feature(feat, tolerance, decimals) for feat in features) if f]
+        payload = json.dumps(
+            {"type": "FeatureCollection", "features": simplified},
+            separators=(",", ":"),
+            ensure_ascii=False
+        ).encode("utf-8")
+        write_level(name, payload)
+        print(f"  {name}: {len(simplified)} features, {len(payload) / 1024:.0f} KB")
+
+    print(f"Map data written to {MAP_DATA_DIR}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the simplified world map levels")
+    parser.add_argument("--source", default=SOURCE_URL, help="Path or URL of the countries GeoJSON")
+    args = parser.parse_args()
+    build(args.source)
@@ -0,0 +1,230 @@
+"""
+Coordination between API worker processes.
+
+With `uvicorn --workers N` (or WEB_CONCURRENCY=N) each worker is a separate
+process. This module gives them a shared view of:
+- the LLM concurrency budget (at most LLM_MAX_CONCURRENCY Ollama generations
+  across all workers). The API server sizes it at startup; offline tools
+  (pregenerate_scenarios.py, simulate_games.py) draw from the same budget
+  without resizing it,
+- cache entries (e.g. rehydrated archived games),
+- ownership claims (which worker runs an idempotent generation or a background job).
+
+Backends (COORDINATION_BACKEND):
+- "sqlite" (default): a SQLite file on shared memory (/dev/shm when available),
+  shared by every worker of the host, no external service needed.
+- "local": in-process only, for a single worker or tests.
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+# A crashed worker's slot is reclaimed once its lease expires
+LLM_SLOT_LEASE_SECONDS = 180.0
+
+_shm = Path("/dev/shm")
+DEFAULT_COORDINATION_PATH = (_shm if _shm.is_dir() else Path(tempfile.gettempdir())) / "stream-history-coordination.db"
+
+# Identifies this worker process in claims and leases
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class LocalBackend:
+    """In-process coordination, only valid with a single worker"""
+
+    def __init__(self, llm_slots: int, cache_size: int = 1024):
+        self.llm_slots = llm_slots
+        self.cache_size = cache_size
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._claims = {}
+
+    def size_llm_slots(self, slots: int) -> None:
+        if self._semaphore is None:
+            self.llm_slots = slots
+
+    def llm_slot_count(self) -> int:
+        return self.llm_slots
+
+    async def acquire_llm_slot(self) -> str:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.llm_slots)
+        await self._semaphore.acquire()
+        return WORKER_ID
+
+    async def release_llm_slot(self, token: str) -> None:
+        self._semaphore.release()
+
+    def cache_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.time():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return value
+
+    def cache_set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._cache[key] = (value, time.time() + ttl)
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def cache_delete(self, key: str) -> None:
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def claim(self, key: str, ttl: float) -> bool:
+        with self._lock:
+            owner, expires = self._claims.get(key, (None, 0))
+            if owner is not None and owner != WORKER_ID and expires > time.time():
+                return False
+            self._claims[key] = (WORKER_ID, time.time() + ttl)
+            return True
+
+    def release_claim(self, key: str) -> None:
+        with self._lock:
+            if self._claims.get(key, (None,))[0] == WORKER_ID:
+                del self._claims[key]
+
+
+class SqliteBackend:
+    """Coordination through a SQLite file shared by all workers of the host"""
+
+    def __init__(self, path: Path, llm_slots: int, cache_size: int = 1024):
+        self.path = str(path)
+        self.llm_slots = llm_slots
+        self.cache_size = cache_size
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS llm_slots (slot INTEGER PRIMARY KEY, holder TEXT, expires REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS claims (key TEXT PRIMARY KEY, owner TEXT, expires REAL)")
+            # Only seed an empty budget: importing this module from a CLI must not
+            # resize the budget of a running API (see size_llm_slots)
+            if conn.execute("SELECT COUNT(*) FROM llm_slots").fetchone()[0] == 0:
+                self._insert_slots(conn, llm_slots)
+
+    @staticmethod
+    def _insert_slots(conn: sqlite3.Connection, slots: int) -> None:
+        conn.executemany(
+            "INSERT OR IGNORE INTO llm_slots (slot, holder, expires) VALUES (?, NULL, 0)",
+            [(slot,) for slot in range(slots)]
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def size_llm_slots(self, slots: int) -> None:
+        """Resize the shared budget, called by the API server at startup"""
+        self.llm_slots = slots
+        conn = self._connect()
+        conn.execute("DELETE FROM llm_slots WHERE slot >= ?", (slots,))
+        self._insert_slots(conn, slots)
+
+    def llm_slot_count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM llm_slots").fetchone()[0]
+
+    def _try_acquire(self) -> Optional[str]:
+        token = f"{WORKER_ID}-{uuid.uuid4().hex[:8]}"
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE llm_slots SET holder = ?, expires = ? WHERE slot = "
+            "(SELECT slot FROM llm_slots WHERE holder IS NULL OR expires < ? LIMIT 1)",
+            (token, now + LLM_SLOT_LEASE_SECONDS, now)
+        )
+        return token if cursor.rowcount == 1 else None
+
+    async def acquire_llm_slot(self) -> str:
+        delay = 0.02
+        while True:
+            token = await asyncio.to_thread(self._try_acquire)
+            if token:
+                return token
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    async def release_llm_slot(self, token: str) -> None:
+        await asyncio.to_thread(
+            lambda: self._connect().execute(
+                "UPDATE llm_slots SET holder = NULL, expires = 0 WHERE holder = ?", (token,)
+            )
+        )
+
+    def cache_get(self, key: str) -> Optional[bytes]:
+        row = self._connect().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires >= ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def cache_set(self, key: str, value: bytes, ttl: float) -> None:
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, value, now + ttl)
+        )
+        # Keep the shared cache bounded: drop expired entries, then the oldest ones
+        conn.execute("DELETE FROM cache WHERE expires < ?", (now,))
+        conn.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.cache_size,)
+        )
+
+    def cache_delete(self, key: str) -> None:
+        self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def claim(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO claims (key, owner, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+            "WHERE claims.owner = excluded.owner OR claims.expires < ?",
+            (key, WORKER_ID, now + ttl, now)
+        )
+        return cursor.rowcount == 1
+
+    def release_claim(self, key: str) -> None:
+        self._connect().execute("DELETE FROM claims WHERE key = ? AND owner = ?", (key, WORKER_ID))
+
+
+def create_backend():
+    name = os.getenv("COORDINATION_BACKEND", "sqlite")
+    if name == "local":
+        return LocalBackend(LLM_MAX_CONCURRENCY)
+    if name == "sqlite":
+        path = Path(os.getenv("COORDINATION_PATH", str(DEFAULT_COORDINATION_PATH)))
+        return SqliteBackend(path, LLM_MAX_CONCURRENCY)
+    raise ValueError(f"Unknown COORDINATION_BACKEND '{name}' (expected 'sqlite' or 'local')")
+
+
+backend = create_backend()
+
+
+@asynccontextmanager
+async def llm_slot():
+    """Hold one slot of the LLM concurrency budget shared by all workers"""
+    token = await backend.acquire_llm_slot()
+    try:
+        yield
+    finally:
+        await backend.release_llm_slot(token)
@@ -0,0 +1,144 @@
+"""
+Turn history export as NDJSON streams.
+
+Each game is written as a "game" line followed by one "turn" line per
+narrative entry. Generators open their own session (the request session is
+closed before a streaming body is sent), read rows through server-side
+cursors, and can gzip the output on the fly.
+"""
+import json
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import func, select, true
+from sqlalchemy.orm import Session, defer
+
+from archive_service import decompress_history
+from database import SessionLocal
+from models import Game, ArchivedGame
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 100
+# Lines per compressed chunk sent to the client
+LINES_PER_FLUSH = 50
+
+
+def _line(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+
+
+def _game_line(game, archived: bool) -> bytes:
+    return _line({
+        "type": "game",
+        "game_id": game.id,
+        "user_id": game.user_id,
+        "country": game.country,
+        "country_code": game.country_code,
+        "current_date": game.current_date,
+        "stats": game.stats,
+        "version": game.version,
+        "created_at": game.created_at.isoformat() if game.created_at else None,
+        "archived": archived,
+    })
+
+
+def _turn_lines(game_id: int, entries: Iterable[Any]) -> Iterator[bytes]:
+    for index, entry in enumerate(entries):
+        if isinstance(entry, str):
+            entry = json.loads(entry)
+        yield _line({"type": "turn", "game_id": game_id, "index": index, **entry})
+
+
+def _history_elements(db: Session, game_id: int) -> Iterator[Any]:
+    """
+    Stream the history entries of an active game one by one.
+    On PostgreSQL and SQLite the JSON array is expanded by the database, so
+    the full history is never materialized in Python.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        elements = func.json_array_elements(Game.narrative_history).table_valued("value", with_ordinality="idx")
+        order = elements.c.idx
+    elif dialect == "sqlite":
+        elements = func.json_each(Game.narrative_history).table_valued("value", "key")
+        order = elements.c.key
+    else:
+        game = db.query(Game).filter(Game.id == game_id).first()
+        yield from (game.narrative_history or []) if game else []
+        return
+
+    stmt = select(elements.c.value).select_from(Game).join(elements, true()) \
+        .where(Game.id == game_id).order_by(order)
+    yield from db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)).scalars()
+
+
+def _export_game(db: Session, game: Game) -> Iterator[bytes]:
+    yield _game_line(game, archived=False)
+    yield from _turn_lines(game.id, _history_elements(db, game.id))
+
+
+def _export_archived(archived: ArchivedGame) -> Iterator[bytes]:
+    yield _game_line(archived, archived=True)
+    yield from _turn_lines(archived.id, decompress_history(archived.history_codec, archived.history_blob))
+
+
+def _game_metadata(db: Session):
+    # The history column is deferred: it is streamed entry by entry instead
+    return db.query(Game).options(defer(Game.narrative_history))
+
+
+def export_game(game_id: int) -> Iterator[bytes]:
+    """NDJSON lines for one game (active or archived)"""
+    db = SessionLocal()
+    try:
+        game = _game_metadata(db).filter(Game.id == game_id).first()
+        if game:
+            yield from _export_game(db, game)
+            return
+        archived = db.query(ArchivedGame).filter(ArchivedGame.id == game_id).first()
+        if archived:
+            yield from _export_archived(archived)
+    finally:
+        db.close()
+
+
+def export_user_games(user_id: int) -> Iterator[bytes]:
+    """NDJSON lines for every game of a user, read through server-side cursors"""
+    db = SessionLocal()
+    # A second session runs the per-game history queries while the cursor is open
+    history_db = SessionLocal()
+    try:
+        games = _game_metadata(db).filter(Game.user_id == user_id).order_by(Game.id) \
+            .execution_options(stream_results=True).yield_per(EXPORT_BATCH_SIZE)
+        for game in games:
+            yield from _export_game(history_db, game)
+
+        archived_games = db.query(ArchivedGame).filter(ArchivedGame.user_id == user_id) \
+            .order_by(ArchivedGame.id).execution_options(stream_results=True).yield_per(EXPORT_BATCH_SIZE)
+        for archived in archived_games:
+            yield from _export_archived(archived)
+    finally:
+        history_db.close()
+        db.close()
+
+
+def game_owner(db: Session, game_id: int) -> Tuple[bool, Optional[int]]:
+    """(found, user_id) of an active or archived game"""
+    row = db.query(Game.user_id).filter(Game.id == game_id).first() \
+        or db.query(ArchivedGame.user_id).filter(ArchivedGame.id == game_id).first()
+    return (row is not None, row.user_id if row else None)
+
+
+def gzip_stream(lines: Iterator[bytes]) -> Iterator[bytes]:
+    """Compress a stream of lines on the fly, flushing every LINES_PER_FLUSH lines"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    pending = 0
+    for line in lines:
+        chunk = compressor.compress(line)
+        pending += 1
+        if pending >= LINES_PER_FLUSH:
+            chunk += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if chunk:
+            yield chunk
+    yield compressor.flush()
@@ -0,0 +1,181 @@
+"""
+Idempotency and request coalescing for expensive game endpoints.
+
+A double-click or a frontend retry must not start a second Ollama generation
+for the same turn. Concurrent identical requests share one in-flight task
+(single-flight), and completed responses are persisted under their
+idempotency key so later retries are answered from the database. With several
+workers, a claim in the coordination backend makes one process own each
+generation while the others wait for its stored response.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from coordination_service import backend as coordination
+from models import IdempotencyRecord
+
+# Longer than a generation: an owner that crashed is taken over after this
+FLIGHT_CLAIM_SECONDS = 300.0
+# Stored responses are replayed for retries only, not kept forever
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls sharing the same key into a single execution.
+    The first caller starts the work, later callers await the same result.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so that one cancelled caller does not abort the shared work
+        return await asyncio.shield(task)
+
+
+# Process-wide coalescing group for game endpoints
+game_flights = SingleFlight()
+
+
+def request_fingerprint(endpoint: str, body: Dict[str, Any], user_id: Optional[int]) -> str:
+    """Hash identifying the request a key was first used for"""
+    payload = json.dumps([endpoint, body, user_id], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _expires_before() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+
+
+def get_stored_response(db: Session, key: str, endpoint: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the stored response for an idempotency key, if any.
+    Raises 409 when the key was used for a different request.
+    """
+    record = db.query(IdempotencyRecord).filter(IdempotencyRecord.key == key).first()
+    if not record:
+        return None
+    created_at = record.created_at
+    if created_at is not None and created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    if created_at is not None and created_at < _expires_before():
+        db.delete(record)
+        db.commit()
+        return None
+    if record.endpoint != endpoint or record.fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=409,
+            detail="Cette clé d'idempotence a déjà été utilisée pour une autre requête"
+        )
+    return record.response
+
+
+def store_response(db: Session, key: str, endpoint: str, fingerprint: str, response: Dict[str, Any]) -> None:
+    """Persist a completed response under its idempotency key"""
+    game_id = (response.get("game") or {}).get("game_id")
+    db.add(IdempotencyRecord(
+        key=key,
+        endpoint=endpoint,
+        fingerprint=fingerprint,
+        game_id=game_id,
+        response=response
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker stored the same key first, keep its response
+        db.rollback()
+    purge_expired_keys(db)
+
+
+def purge_expired_keys(db: Session) -> None:
+    """Drop stored responses older than IDEMPOTENCY_TTL_HOURS"""
+    db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.created_at < _expires_before()
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def purge_game_keys(db: Session, game_id: int) -> None:
+    """Drop the stored responses of a deleted game"""
+    db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.game_id == game_id
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+async def _wait_for_owner(db: Session, key: str, endpoint: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """
+    Wait until the worker owning this key stores its response.
+    Returns None if the owner gave up (claim released or expired) and this
+    worker now holds the claim.
+    """
+    deadline = time.monotonic() + FLIGHT_CLAIM_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.25)
+        db.expire_all()
+        stored = get_stored_response(db, key, endpoint, fingerprint)
+        if stored:
+            return stored
+        if await asyncio.to_thread(coordination.claim, f"flight:{key}", FLIGHT_CLAIM_SECONDS):
+            return None
+    return None
+
+
+async def run_idempotent(
+    db: Session,
+    endpoint: str,
+    idempotency_key: Optional[str],
+    fingerprint: str,
+    flight_key: Optional[str],
+    func: Callable[[], Awaitable[BaseModel]],
+    response_model: Type[BaseModel]
+) -> BaseModel:
+    """
+    Run an expensive endpoint body at most once per idempotency key:
+    replay the stored response, or claim the key and run the body, or wait for
+    the worker that owns the claim. Claims are re-entrant for the same
+    WORKER_ID, so a concurrent request in the owning process also gets the
+    claim and joins the running generation through the single-flight.
+    Without a key, concurrent calls sharing flight_key are coalesced, and a
+    None flight_key runs the body on its own.
+    """
+    if not idempotency_key:
+        if flight_key is None:
+            return await func()
+        return await game_flights.do(flight_key, func)
+
+    stored = get_stored_response(db, idempotency_key, endpoint, fingerprint)
+    if stored:
+        return response_model(**stored)
+
+    claim_key = f"flight:{idempotency_key}"
+    # Claims live in a SQLite file shared by the workers: keep its I/O off the event loop
+    if not await asyncio.to_thread(coordination.claim, claim_key, FLIGHT_CLAIM_SECONDS):
+        stored = await _wait_for_owner(db, idempotency_key, endpoint, fingerprint)
+        if stored:
+            return response_model(**stored)
+
+    try:
+        response = await game_flights.do(flight_key, func)
+        if response.success:
+            store_response(db, idempotency_key, endpoint, fingerprint, response.model_dump())
+    finally:
+        await asyncio.to_thread(coordination.release_claim, claim_key)
+    return response
@@ -1,12 +1,21 @@
-from fastapi import FastAPI, Depends, HTTPException
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.orm.exc import StaleDataError
+from typing import List, Optional
 import json
 from datetime import datetime
 
-from database import get_db, engine, Base
-from models import User, Game
+from database import get_db
+from models import User, Game, ArchivedGame
 from schemas import (
     StartGameRequest, StartGameResponse,
     MakeDecisionRequest, DecisionResponse,
@@ -19,14 +28,49 @@ from ollama_service import (
     check_ollama_health,
     OllamaError
 )
+from idempotency_service import run_idempotent, request_fingerprint, purge_game_keys
+from scenario_catalog import get_catalog_situation, get_catalog_audio
+from tts_service import generate_speech_python, FRENCH_MODEL
+from map_service import get_map_level, MapDataError
+from auth_service import (
+    hash_password,
+    verify_password,
+    needs_rehash,
+    create_token,
+    get_current_user,
+    require_user
+)
+from archive_service import get_archived_game, restore_game, delete_archived_game
+import archive_service
+from export_service import export_game, export_user_games, game_owner, gzip_stream
+import coordination_service
+import warmup_service
+
+warmup_service.state.import_seconds = time.perf_counter() - IMPORT_STARTED
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start serving immediately and warm the database pool, the voice model and
+    Ollama in the background. Schema migrations run out of band (migrate.py).
+    The archival of old games also runs in the background.
+    """
+    # The server owns the size of the LLM budget shared with the other workers and the CLIs
+    await asyncio.to_thread(coordination_service.backend.size_llm_slots, coordination_service.LLM_MAX_CONCURRENCY)
+    tasks = [asyncio.create_task(warmup_service.warm_up(IMPORT_STARTED))]
+    if archive_service.ARCHIVE_INTERVAL_HOURS > 0:
+        tasks.append(asyncio.create_task(archive_service.run_periodically()))
+    yield
+    for task in tasks:
+        task.cancel()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="Geopolitical Simulation Game API",
     description="API pour un jeu de simulation géopolitique assisté par IA",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS for frontend
@@ -45,19 +89,41 @@ async def root():
     return {"status": "ok", "message": "Geopolitical Simulation API"}
 
 
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readiness():
+    """Readiness probe: 200 once the database and Ollama are warm, 503 before"""
+    status = warmup_service.state.as_dict()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
 # ===== TTS ENDPOINT =====
-from fastapi.responses import Response
-from tts_service import generate_speech_python, FRENCH_MODEL
 
 
 @app.post("/tts")
-async def text_to_speech(request: dict):
+async def text_to_speech(request: dict, db: Session = Depends(get_db)):
     """Generate speech from text using Piper TTS"""
     text = request.get("text", "")
     
     if not text:
         raise HTTPException(status_code=400, detail="Text is required")
     
+    # Opening narratives of catalog scenarios are synthesized ahead of time
+    cached_audio = get_catalog_audio(db, text)
+    if cached_audio:
+        return Response(
+            content=cached_audio,
+            media_type="audio/wav",
+            headers={
+                "Content-Disposition": "inline; filename=speech.wav"
+            }
+        )
+    
     if not FRENCH_MODEL.exists():
         raise HTTPException(
             status_code=500, 
@@ -77,6 +143,40 @@ async def text_to_speech(request: dict):
         raise HTTPException(status_code=500, detail=f"TTS generation failed: {str(e)}")
 
 
+# ===== MAP ENDPOINT =====
+
+MAP_CACHE_CONTROL = "public, max-age=604800, stale-while-revalidate=86400"
+
+
+@app.get("/map/countries/{level}")
+async def get_countries_map(level: str, request: Request):
+    """Serve a pre-simplified country geometry level (low, medium, high)"""
+    try:
+        map_level = get_map_level(level)
+    except MapDataError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if map_level is None:
+        raise HTTPException(status_code=404, detail="Niveau de détail inconnu")
+    
+    encoding, mapped = map_level.select(request.headers.get("accept-encoding", ""))
+    headers = {
+        "Cache-Control": MAP_CACHE_CONTROL,
+        "ETag": map_level.etag(encoding),
+        "Vary": "Accept-Encoding",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    
+    headers["Content-Length"] = str(mapped.size)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(
+        mapped.iter_chunks(),
+        media_type="application/geo+json",
+        headers=headers
+    )
+
+
 @app.get("/health/ollama")
 async def check_ollama():
     """Check if Ollama is available"""
@@ -88,13 +188,6 @@ async def check_ollama():
 
 
 # ===== AUTHENTICATION ENDPOINTS =====
-import hashlib
-
-def hash_password(password: str) -> str:
-    """Simple password hashing (use bcrypt in production)"""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-
 @app.post("/auth/register")
 async def register(request: dict, db: Session = Depends(get_db)):
     """Register a new user"""
@@ -115,10 +208,10 @@ async def register(request: dict, db: Session = Depends(get_db)):
     if existing:
         raise HTTPException(status_code=400, detail="Ce nom d'utilisateur existe déjà")
     
-    # Create user
+    # Create user (hashing runs in the auth thread pool)
     user = User(
         username=username,
-        password_hash=hash_password(password)
+        password_hash=await hash_password(password)
     )
     db.add(user)
     db.commit()
@@ -127,7 +220,7 @@ async def register(request: dict, db: Session = Depends(get_db)):
     return {
         "success": True,
         "user": {"id": user.id, "username": user.username},
-        "token": f"user_{user.id}"  # Simple token for demo
+        "token": create_token(user.id, user.username)
     }
 
 
@@ -139,41 +232,71 @@ async def login(request: dict, db: Session = Depends(get_db)):
     
     user = db.query(User).filter(User.username == username).first()
     
-    if not user or user.password_hash != hash_password(password):
+    if not await verify_password(password, user.password_hash if user else None):
         raise HTTPException(status_code=401, detail="Identifiants incorrects")
     
+    # Upgrade legacy or outdated hashes now that the password is known
+    if needs_rehash(user.password_hash):
+        user.password_hash = await hash_password(password)
+        db.commit()
+    
     return {
         "success": True,
         "user": {"id": user.id, "username": user.username},
-        "token": f"user_{user.id}"
+        "token": create_token(user.id, user.username)
     }
 
 
 @app.get("/auth/me")
-async def get_current_user(user_id: int, db: Session = Depends(get_db)):
-    """Get current user info"""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    return {"id": user.id, "username": user.username}
+async def get_me(user: dict = Depends(require_user)):
+    """Get current user info from the session token (no database access)"""
+    return user
 
 
 @app.post("/start_game", response_model=StartGameResponse)
-async def start_game(request: StartGameRequest, db: Session = Depends(get_db)):
+async def start_game(
+    request: StartGameRequest,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None),
+    current_user: Optional[dict] = Depends(get_current_user)
+):
     """
     Initialize a new game session.
     Takes a country name and starting year, generates initial situation via Ollama.
+    Concurrent identical requests share one generation; an Idempotency-Key
+    header makes retries return the original game instead of creating another.
     """
+    # Only the signed session token identifies the player: a user_id in the body is ignored
+    request.user_id = current_user["id"] if current_user else None
+    
+    # Without a key, only an identified player's identical requests are coalesced:
+    # two guests starting the same country and year must get two games
+    flight_key = idempotency_key
+    if flight_key is None and current_user:
+        flight_key = f"start_game:{current_user['id']}:{request.country}:{request.country_code}:{request.year}"
+    fingerprint = request_fingerprint("start_game", request.model_dump(), request.user_id)
+    return await run_idempotent(
+        db, "start_game", idempotency_key, fingerprint, flight_key,
+        lambda: _run_start_game(request, db), StartGameResponse
+    )
+
+
+async def _run_start_game(request: StartGameRequest, db: Session) -> StartGameResponse:
+    """Generate the initial situation and create the game record"""
     try:
-        # Check Ollama availability
-        if not await check_ollama_health():
-            raise OllamaError(
-                "Ollama n'est pas disponible. Démarrez-le avec 'ollama serve' "
-                "puis 'ollama run mistral' (ou un autre modèle)."
-            )
+        # Use the pre-generated scenario for this start point when there is one
+        situation = get_catalog_situation(db, request.country, request.year)
         
-        # Generate initial situation from Ollama
-        situation = await generate_initial_situation(request.country, request.year)
+        if situation is None:
+            # Check Ollama availability
+            if not await check_ollama_health():
+                raise OllamaError(
+                    "Ollama n'est pas disponible. Démarrez-le avec 'ollama serve' "
+                    "puis 'ollama run mistral' (ou un autre modèle)."
+                )
+            
+            # Generate initial situation from Ollama
+            situation = await generate_initial_situation(request.country, request.year)
         
         # Create game record
         game = Game(
@@ -217,7 +340,8 @@ async def start_game(request: StartGameRequest, db: Session = Depends(get_db)):
             current_date=game.current_date,
             stats=StatsResponse(**stats),
             narrative=situation.get("narrative", ""),
-            choices=choices
+            choices=choices,
+            version=game.version
         )
         
         return StartGameResponse(success=True, game=game_state)
@@ -229,18 +353,52 @@ async def start_game(request: StartGameRequest, db: Session = Depends(get_db)):
 
 
 @app.post("/make_decision", response_model=DecisionResponse)
-async def make_decision(request: MakeDecisionRequest, db: Session = Depends(get_db)):
+async def make_decision(
+    request: MakeDecisionRequest,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None),
+    current_user: Optional[dict] = Depends(get_current_user)
+):
     """
     Process a player's decision and generate the outcome.
+    Concurrent identical decisions share one generation; an Idempotency-Key
+    header makes retries return the original outcome instead of playing the turn twice.
     """
+    flight_key = idempotency_key or (
+        f"make_decision:{request.game_id}:{request.expected_version}:{request.choice_index}"
+    )
+    fingerprint = request_fingerprint(
+        "make_decision", request.model_dump(), current_user["id"] if current_user else None
+    )
+    return await run_idempotent(
+        db, "make_decision", idempotency_key, fingerprint, flight_key,
+        lambda: _run_make_decision(request, db), DecisionResponse
+    )
+
+
+async def _run_make_decision(request: MakeDecisionRequest, db: Session) -> DecisionResponse:
+    """Generate the outcome of a decision and apply it to the game"""
     try:
         # Get the game
         game = db.query(Game).filter(Game.id == request.game_id).first()
-        if not game:
+        if game:
+            state = _game_state(game)
+        else:
+            # An archived game is read from the archive, and only moved back to
+            # the active table once the new turn is about to be applied
+            state = await asyncio.to_thread(get_archived_game, db, request.game_id)
+        if not state:
             return DecisionResponse(success=False, error="Partie non trouvée")
         
+        # Reject decisions made against an outdated state of the game
+        if request.expected_version is not None and state["version"] != request.expected_version:
+            return DecisionResponse(
+                success=False,
+                error="La partie a déjà avancé, rechargez-la avant de décider"
+            )
+        
         # Get the selected choice
-        choices = game.current_choices or []
+        choices = state["current_choices"] or []
         if request.choice_index >= len(choices):
             return DecisionResponse(success=False, error="Choix invalide")
         
@@ -252,15 +410,26 @@ async def make_decision(request: MakeDecisionRequest, db: Session = Depends(get_
             raise OllamaError("Ollama n'est pas disponible")
         
         # Generate outcome
-        current_year = int(game.current_date)
+        current_year = int(state["current_date"])
         outcome = await generate_decision_outcome(
-            country=game.country,
+            country=state["country"],
             year=current_year,
-            current_stats=game.stats,
+            current_stats=state["stats"],
             choice_text=choice_text,
-            narrative_history=game.narrative_history or []
+            narrative_history=state["narrative_history"] or []
         )
         
+        if game is None:
+            # Resuming an archived game brings it back to the active table
+            game = await asyncio.to_thread(restore_game, db, request.game_id)
+            if game is None:
+                return DecisionResponse(success=False, error="Partie non trouvée")
+            if game.version != state["version"]:
+                return DecisionResponse(
+                    success=False,
+                    error="La partie a été modifiée par une autre requête, rechargez-la"
+                )
+        
         # Apply stat changes
         stat_changes = outcome.get("stat_changes", {})
         new_stats = game.stats.copy()
@@ -283,13 +452,20 @@ async def make_decision(request: MakeDecisionRequest, db: Session = Depends(get_
         new_year = outcome.get("new_year", current_year + 1)
         new_choices = outcome.get("new_choices", [])
         
-        # Update database
+        # Update database (the version check rejects a concurrent stale write)
         game.stats = new_stats
         game.narrative_history = new_history
         game.current_date = str(new_year)
         game.current_choices = new_choices
         
-        db.commit()
+        try:
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            return DecisionResponse(
+                success=False,
+                error="La partie a été modifiée par une autre requête, rechargez-la"
+            )
         db.refresh(game)
         
         # Build response
@@ -308,7 +484,8 @@ async def make_decision(request: MakeDecisionRequest, db: Session = Depends(get_
             current_date=game.current_date,
             stats=StatsResponse(**new_stats),
             narrative=new_narrative,
-            choices=choices_response
+            choices=choices_response,
+            version=game.version
         )
         
         return DecisionResponse(
@@ -324,12 +501,69 @@ async def make_decision(request: MakeDecisionRequest, db: Session = Depends(get_
         return DecisionResponse(success=False, error=f"Erreur serveur: {str(e)}")
 
 
+# ===== HISTORY EXPORT =====
+
+def _ndjson_response(lines, request: Request) -> StreamingResponse:
+    """Stream NDJSON lines, gzipped on the fly when the client accepts it"""
+    headers = {"Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        lines = gzip_stream(lines)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(lines, media_type="application/x-ndjson", headers=headers)
+
+
+@app.get("/games/export")
+async def export_games(
+    request: Request,
+    user_id: Optional[int] = None,
+    current_user: dict = Depends(require_user)
+):
+    """Export the full turn log of every game of the session user as a single NDJSON stream"""
+    if user_id is not None and user_id != current_user["id"]:
+        raise HTTPException(status_code=403, detail="Vous ne pouvez exporter que vos propres parties")
+    return _ndjson_response(export_user_games(current_user["id"]), request)
+
+
+@app.get("/games/{game_id}/history")
+async def export_game_history(
+    game_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_user)
+):
+    """Export the full turn log of one of the session user's games as NDJSON (game line, then one line per turn)"""
+    found, owner_id = game_owner(db, game_id)
+    if not found:
+        raise HTTPException(status_code=404, detail="Partie non trouvée")
+    if owner_id != current_user["id"]:
+        raise HTTPException(status_code=403, detail="Vous ne pouvez exporter que vos propres parties")
+    return _ndjson_response(export_game(game_id), request)
+
+
+def _game_state(game: Game) -> dict:
+    """Plain state of an active game, shaped like a rehydrated archived game"""
+    return {
+        "id": game.id,
+        "country": game.country,
+        "current_date": game.current_date,
+        "stats": game.stats,
+        "current_choices": game.current_choices,
+        "narrative_history": game.narrative_history,
+        "version": game.version,
+    }
+
+
 @app.get("/games/{game_id}", response_model=GameStateResponse)
 async def get_game(game_id: int, db: Session = Depends(get_db)):
-    """Get current game state"""
+    """Get current game state (archived games are rehydrated transparently)"""
     game = db.query(Game).filter(Game.id == game_id).first()
-    if not game:
-        raise HTTPException(status_code=404, detail="Partie non trouvée")
+    if game:
+        state = _game_state(game)
+    else:
+        # The shared cache is a SQLite file: keep its I/O off the event loop
+        state = await asyncio.to_thread(get_archived_game, db, game_id)
+        if not state:
+            raise HTTPException(status_code=404, detail="Partie non trouvée")
     
     choices = [
         ChoiceOption(
@@ -337,31 +571,41 @@ async def get_game(game_id: int, db: Session = Depends(get_db)):
             text=c.get("text", ""),
             risk_level=c.get("risk_level", "medium")
         )
-        for i, c in enumerate(game.current_choices or [])
+        for i, c in enumerate(state["current_choices"] or [])
     ]
     
     # Get last narrative
     narrative = ""
-    if game.narrative_history:
-        for entry in reversed(game.narrative_history):
+    if state["narrative_history"]:
+        for entry in reversed(state["narrative_history"]):
             if entry.get("role") == "system":
                 narrative = entry.get("content", "")
                 break
     
     return GameStateResponse(
-        game_id=game.id,
-        country=game.country,
-        current_date=game.current_date,
-        stats=StatsResponse(**game.stats),
+        game_id=state["id"],
+        country=state["country"],
+        current_date=state["current_date"],
+        stats=StatsResponse(**state["stats"]),
         narrative=narrative,
-        choices=choices
+        choices=choices,
+        version=state["version"]
     )
 
 
 @app.get("/games", response_model=List[dict])
 async def list_games(db: Session = Depends(get_db)):
-    """List all games"""
-    games = db.query(Game).order_by(Game.created_at.desc()).limit(10).all()
+    """List all games (active and archived)"""
+    games = db.query(Game.id, Game.country, Game.current_date, Game.created_at) \
+        .order_by(Game.created_at.desc()).limit(10).all()
+    # Only light columns: the compressed histories are never loaded here
+    archived = db.query(ArchivedGame.id, ArchivedGame.country, ArchivedGame.current_date, ArchivedGame.created_at) \
+        .order_by(ArchivedGame.created_at.desc()).limit(10).all()
+    newest = sorted(
+        list(games) + list(archived),
+        key=lambda g: g.created_at.timestamp() if g.created_at else 0,
+        reverse=True
+    )[:10]
     return [
         {
             "id": g.id,
@@ -369,7 +613,7 @@ async def list_games(db: Session = Depends(get_db)):
             "current_date": g.current_date,
             "created_at": g.created_at.isoformat() if g.created_at else None
         }
-        for g in games
+        for g in newest
     ]
 
 
@@ -378,12 +622,18 @@ async def delete_game(game_id: int, db: Session = Depends(get_db)):
     """Delete a saved game"""
     game = db.query(Game).filter(Game.id == game_id).first()
     if not game:
+        if await asyncio.to_thread(delete_archived_game, db, game_id):
+            purge_game_keys(db, game_id)
+            return {"success": True, "message": "Partie supprimée"}
         raise HTTPException(status_code=404, detail="Partie non trouvée")
     db.delete(game)
     db.commit()
+    purge_game_keys(db, game_id)
     return {"success": True, "message": "Partie supprimée"}
 
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Several workers share the LLM budget and caches through coordination_service
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=int(os.getenv("WEB_CONCURRENCY", "1")))
@@ -0,0 +1,101 @@
+"""
+Country geometry service
+Serves pre-simplified, precompressed world map levels built by build_map_data.py
+"""
+import gzip
+import hashlib
+import mmap
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+# Directory holding the generated map levels
+MAP_DATA_DIR = Path(__file__).parent / "map_data"
+
+# Level of detail -> (simplification tolerance in degrees, coordinate decimals)
+MAP_LEVELS = {
+    "low": (0.2, 2),      # zoom 2-3
+    "medium": (0.05, 3),  # zoom 4
+    "high": (0.01, 3),    # zoom 5-6
+}
+
+# Precompressed variants in order of preference: Content-Encoding -> file suffix
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+CHUNK_SIZE = 64 * 1024
+
+
+class MapDataError(Exception):
+    """Exception raised when a map level has not been generated"""
+    pass
+
+
+class MappedFile:
+    """Read-only memory map of a generated file, shared by all requests"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self._map)
+
+    def hexdigest(self) -> str:
+        return hashlib.sha1(self._map).hexdigest()
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        for offset in range(0, self.size, CHUNK_SIZE):
+            yield self._map[offset:offset + CHUNK_SIZE]
+
+
+class MapLevel:
+    """All encodings of one level of detail plus its ETag"""
+
+    def __init__(self, name: str):
+        base = MAP_DATA_DIR / f"countries_{name}.geojson"
+        if not base.exists():
+            raise MapDataError(
+                f"Map level '{name}' not found in {MAP_DATA_DIR}. "
+                "Run 'python build_map_data.py' first."
+            )
+        self.files: Dict[str, MappedFile] = {"identity": MappedFile(base)}
+        for encoding, suffix in ENCODINGS:
+            path = base.with_name(base.name + suffix)
+            if path.exists():
+                self.files[encoding] = MappedFile(path)
+        self.digest = self.files["identity"].hexdigest()[:16]
+
+    def select(self, accept_encoding: str) -> Tuple[str, MappedFile]:
+        """Pick the best precompressed variant accepted by the client"""
+        accepted = {token.split(";")[0].strip() for token in accept_encoding.lower().split(",")}
+        for encoding, _ in ENCODINGS:
+            if encoding in accepted and encoding in self.files:
+                return encoding, self.files[encoding]
+        return "identity", self.files["identity"]
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.digest}-{encoding}"'
+
+
+_levels: Dict[str, MapLevel] = {}
+
+
+def get_map_level(name: str) -> Optional[MapLevel]:
+    """Return the memory-mapped level, or None for an unknown level name"""
+    if name not in MAP_LEVELS:
+        return None
+    if name not in _levels:
+        _levels[name] = MapLevel(name)
+    return _levels[name]
+
+
+def write_level(name: str, payload: bytes) -> None:
+    """Write one level and its precompressed variants"""
+    MAP_DATA_DIR.mkdir(exist_ok=True)
+    base = MAP_DATA_DIR / f"countries_{name}.geojson"
+    base.write_bytes(payload)
+    base.with_name(base.name + ".gz").write_bytes(gzip.compress(payload, compresslevel=9))
+    try:
+        import brotli
+        base.with_name(base.name + ".br").write_bytes(brotli.compress(payload, quality=11))
+    except ImportError:
+        pass
+    _levels.pop(name, None)
@@ -0,0 +1,123 @@
+"""
+Database schema migrations, run out of band before the API starts.
+
+Creates missing tables and adds columns introduced after a table was first
+created. Every step is idempotent, so running it on each deploy is safe.
+
+Usage:
+    python migrate.py
+"""
+import time
+
+from sqlalchemy import inspect, text
+
+from database import engine, Base
+import models  # noqa: F401  (registers the tables on Base.metadata)
+
+# Columns added to existing tables: (table, column, SQL definition)
+ADDED_COLUMNS = [
+    ("games", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("idempotency_keys", "fingerprint", "VARCHAR(64)"),
+    ("idempotency_keys", "game_id", "INTEGER"),
+]
+
+# Indexes added to existing tables: (index, table, column)
+ADDED_INDEXES = [
+    ("ix_games_user_id", "games", "user_id"),
+    ("ix_idempotency_keys_game_id", "idempotency_keys", "game_id"),
+    ("ix_idempotency_keys_created_at", "idempotency_keys", "created_at"),
+]
+
+
+def migrate() -> list:
+    """Bring the schema up to date, return the list of applied changes"""
+    applied = []
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            table.create(bind=engine)
+            applied.append(f"create table {table.name}")
+
+    with engine.begin() as conn:
+        for table, column, definition in ADDED_COLUMNS:
+            if table not in existing_tables:
+                continue  # created above with all its columns
+            columns = {c["name"] for c in inspector.get_columns(table)}
+            if column not in columns:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+                applied.append(f"add column {table}.{column}")
+
+        for index, table, column in ADDED_INDEXES:
+            if table not in existing_tables:
+                continue
+            if index not in {i["name"] for i in inspector.get_indexes(table)}:
+                conn.execute(text(f"CREATE INDEX {index} ON {table} ({column})"))
+                applied.append(f"create index {index}")
+
+        if engine.dialect.name == "sqlite" and "games" in existing_tables and not _has_autoincrement(conn, "games"):
+            _rebuild_games_with_autoincrement(conn)
+            applied.append("rebuild table games with AUTOINCREMENT")
+
+    return applied
+
+
+def _has_autoincrement(conn, table: str) -> bool:
+    sql = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table}
+    ).scalar()
+    return "AUTOINCREMENT" in (sql or "").upper()
+
+
+def _rebuild_games_with_autoincrement(conn) -> None:
+    """
+    Recreate the SQLite games table with AUTOINCREMENT. Without it, SQLite hands
+    out the id of the last deleted or archived game again.
+    """
+    conn.execute(text("ALTER TABLE games RENAME TO games_old"))
+    # Index names are global in SQLite: drop the old ones before recreating the table
+    old_indexes = conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'games_old' AND sql IS NOT NULL"
+    )).scalars().all()
+    for index in old_indexes:
+        conn.execute(text(f"DROP INDEX {index}"))
+    models.Game.__table__.create(bind=conn)
+
+    old_columns = {row[1] for row in conn.execute(text("PRAGMA table_info(games_old)"))}
+    columns = ", ".join(f'"{c.name}"' for c in models.Game.__table__.columns if c.name in old_columns)
+    conn.execute(text(f"INSERT INTO games ({columns}) SELECT {columns} FROM games_old"))
+    conn.execute(text("DROP TABLE games_old"))
+
+    # Start after every id ever handed out, including the archived games
+    last_id = conn.execute(text(
+        "SELECT MAX(id) FROM (SELECT MAX(id) AS id FROM games UNION ALL SELECT MAX(id) FROM archived_games)"
+    )).scalar() or 0
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'games'"))
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('games', :seq)"), {"seq": last_id})
+
+
+def schema_is_current() -> bool:
+    """True when every table, added column and added index exists"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    if not all(table.name in existing_tables for table in Base.metadata.sorted_tables):
+        return False
+    for table, column, _ in ADDED_COLUMNS:
+        if column not in {c["name"] for c in inspector.get_columns(table)}:
+            return False
+    for index, table, _ in ADDED_INDEXES:
+        if index not in {i["name"] for i in inspector.get_indexes(table)}:
+            return False
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            return _has_autoincrement(conn, "games")
+    return True
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    changes = migrate()
+    for change in changes:
+        print(f"  {change}")
+    print(f"Schema up to date ({len(changes)} changes) in {time.perf_counter() - started:.2f}s")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -18,7 +18,7 @@ class Game(Base):
     __tablename__ = "games"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     country = Column(String(100), nullable=False)
     country_code = Column(String(10), nullable=True)
     current_date = Column(String(50), nullable=False)
@@ -41,4 +41,72 @@ class Game(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Version pour le verrouillage optimiste: une écriture basée sur un état périmé est rejetée
+    version = Column(Integer, nullable=False, default=1)
+    
     user = relationship("User", back_populates="games")
+    
+    __mapper_args__ = {"version_id_col": version}
+    # Les ids libérés (archivage, suppression) ne sont jamais réattribués sous SQLite
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+class ArchivedGame(Base):
+    __tablename__ = "archived_games"
+    
+    # Même identifiant que dans la table games, pour que l'archivage soit transparent
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    country = Column(String(100), nullable=False)
+    country_code = Column(String(10), nullable=True)
+    current_date = Column(String(50), nullable=False)
+    stats = Column(JSON, nullable=False)
+    current_choices = Column(JSON, default=[])
+    version = Column(Integer, nullable=False, default=1)
+    
+    # Historique narratif sérialisé en JSON puis compressé ("zstd" ou "gzip")
+    history_codec = Column(String(10), nullable=False)
+    history_blob = Column(LargeBinary, nullable=False)
+    history_raw_size = Column(Integer, nullable=False)
+    
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(255), unique=True, index=True, nullable=False)
+    endpoint = Column(String(50), nullable=False)
+    
+    # Empreinte (endpoint, corps de la requête, utilisateur): une clé réutilisée
+    # pour une autre requête n'est jamais rejouée
+    fingerprint = Column(String(64), nullable=True)
+    # Partie concernée, pour purger ses clés quand elle est supprimée
+    game_id = Column(Integer, index=True, nullable=True)
+    
+    # Réponse complète renvoyée au client, rejouée lors d'un nouvel essai
+    response = Column(JSON, nullable=False)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class Scenario(Base):
+    __tablename__ = "scenario_catalog"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    country = Column(String(100), nullable=False)
+    year = Column(Integer, nullable=False)
+    
+    # Situation initiale générée hors ligne: {narrative, stats, choices, historical_context}
+    situation = Column(JSON, nullable=False)
+    
+    # Narration pré-synthétisée (WAV), retrouvée par le hash SHA-256 du texte
+    narrative_hash = Column(String(64), index=True, nullable=True)
+    narrative_audio = Column(LargeBinary, nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (UniqueConstraint("country", "year", name="uq_scenario_country_year"),)
@@ -3,6 +3,8 @@ import json
 from typing import Dict, Any, List, Optional
 import os
 
+from coordination_service import llm_slot
+
 OLLAMA_BASE_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "ministral-3:3b")
 
@@ -22,13 +24,32 @@ async def check_ollama_health() -> bool:
         return False
 
 
+async def warm_up_model() -> None:
+    """
+    Load the model into Ollama's memory so the first turn does not pay for it.
+    Raises OllamaError if Ollama is not available.
+    """
+    try:
+        async with httpx.AsyncClient(timeout=300.0) as client:
+            # An empty prompt only loads the model
+            response = await client.post(
+                f"{OLLAMA_BASE_URL}/api/generate",
+                json={"model": OLLAMA_MODEL, "prompt": "", "keep_alive": "30m"}
+            )
+            if response.status_code != 200:
+                raise OllamaError(f"Ollama returned status {response.status_code}")
+    except httpx.HTTPError as e:
+        raise OllamaError(f"Impossible de charger le modèle {OLLAMA_MODEL}: {str(e)}")
+
+
 async def generate_completion(prompt: str, system_prompt: str = "") -> str:
     """
     Send a prompt to Ollama and get a completion.
     Raises OllamaError if Ollama is not available.
     """
     try:
-        async with httpx.AsyncClient(timeout=120.0) as client:
+        # Generations are capped across all worker processes
+        async with llm_slot(), httpx.AsyncClient(timeout=120.0) as client:
             payload = {
                 "model": OLLAMA_MODEL,
                 "prompt": prompt,
@@ -124,7 +145,9 @@ Assure-toi que les choix sont pertinents pour {country} en {year} et reflètent
                 {"index": 1, "text": "Moderniser l'armée", "risk_level": "medium"},
                 {"index": 2, "text": "Lancer une offensive diplomatique", "risk_level": "medium"}
             ],
-            "historical_context": "Période de transition majeure."
+            "historical_context": "Période de transition majeure.",
+            # Generic situation, not generated for this country and year
+            "fallback": True
         }
 
 
@@ -0,0 +1,192 @@
+"""
+Offline pre-generation of the scenario catalog.
+
+Runs generate_initial_situation over a grid of countries x years with bounded
+concurrency and stores each result in the scenario_catalog table, which
+start_game reads before calling Ollama. Every scenario is committed as soon as
+it is generated, so an interrupted run resumes where it stopped.
+
+Generations also hold a slot of the LLM budget shared with the API
+(coordination_service): the effective concurrency is the lower of
+--concurrency and the budget the running server was started with.
+
+Usage:
+    python pregenerate_scenarios.py [--countries France,Germany] [--years 1789,1914]
+                                    [--concurrency 4] [--tts] [--tts-workers 2]
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from database import SessionLocal
+from migrate import migrate
+from coordination_service import backend as coordination
+from models import Scenario
+from ollama_service import generate_initial_situation, check_ollama_health, OllamaError
+from scenario_catalog import narrative_hash
+
+# Major powers (names as shown on the world map) and landmark years
+DEFAULT_COUNTRIES = [
+    "France", "Germany", "United Kingdom", "Italy", "Spain", "Russia",
+    "United States of America", "China", "Japan", "Turkey", "Egypt", "India"
+]
+DEFAULT_YEARS = [-50, 800, 1453, 1648, 1789, 1815, 1871, 1914, 1939, 1962, 1989]
+STAT_KEYS = ("gold", "stability", "army", "population", "diplomacy")
+
+
+class CatalogStats:
+    """Progress, throughput and failure counters for a run"""
+
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.done = 0
+        self.failed = 0
+        self.audio = 0
+        self.started = time.perf_counter()
+
+    def report(self, label: str) -> None:
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed * 60 if elapsed > 0 else 0.0
+        print(
+            f"[{self.done + self.failed}/{self.total}] {label} | "
+            f"ok={self.done} failed={self.failed} audio={self.audio} | "
+            f"{rate:.1f} scenarios/min"
+        )
+
+
+def pending_start_points(countries: List[str], years: List[int]) -> Tuple[List[Tuple[str, int]], int]:
+    """Grid points not yet in the catalog, and the number already done"""
+    db = SessionLocal()
+    try:
+        existing = {(s.country, s.year) for s in db.query(Scenario.country, Scenario.year).all()}
+    finally:
+        db.close()
+    grid = [(country, year) for country in countries for year in years]
+    pending = [point for point in grid if point not in existing]
+    return pending, len(grid) - len(pending)
+
+
+def save_scenario(country: str, year: int, situation: dict, audio: Optional[bytes]) -> None:
+    db = SessionLocal()
+    try:
+        narrative = situation.get("narrative", "")
+        db.add(Scenario(
+            country=country,
+            year=year,
+            situation=situation,
+            narrative_hash=narrative_hash(narrative) if audio else None,
+            narrative_audio=audio
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def situation_problem(situation: Dict[str, Any]) -> Optional[str]:
+    """Why a generated situation must not enter the catalog, None if it is usable"""
+    if situation.get("fallback"):
+        return "unparseable model answer (generic fallback)"
+    if not situation.get("narrative"):
+        return "missing narrative"
+    stats = situation.get("stats")
+    if not isinstance(stats, dict) or any(key not in stats for key in STAT_KEYS):
+        return "incomplete stats"
+    if not situation.get("choices"):
+        return "no choices"
+    return None
+
+
+async def generate_one(
+    country: str,
+    year: int,
+    semaphore: asyncio.Semaphore,
+    tts_pool: Optional[ProcessPoolExecutor],
+    stats: CatalogStats
+) -> None:
+    async with semaphore:
+        try:
+            situation = await generate_initial_situation(country, year)
+        except OllamaError as e:
+            stats.failed += 1
+            stats.report(f"FAILED {country} {year}: {e}")
+            return
+
+    # A fallback or partial answer is left out so the next run retries it
+    problem = situation_problem(situation)
+    if problem:
+        stats.failed += 1
+        stats.report(f"FAILED {country} {year}: {problem}")
+        return
+
+    audio = None
+    if tts_pool is not None and situation.get("narrative"):
+        from tts_service import generate_speech_python
+        try:
+            # Synthesis is CPU-bound, keep it off the event loop
+            loop = asyncio.get_running_loop()
+            audio = await loop.run_in_executor(tts_pool, generate_speech_python, situation["narrative"])
+            stats.audio += 1
+        except Exception as e:
+            print(f"TTS failed for {country} {year}: {e}")
+
+    await asyncio.to_thread(save_scenario, country, year, situation, audio)
+    stats.done += 1
+    stats.report(f"{country} {year}")
+
+
+async def run(countries: List[str], years: List[int], concurrency: int, tts_workers: int) -> CatalogStats:
+    migrate()
+    pending, skipped = pending_start_points(countries, years)
+    stats = CatalogStats(total=len(pending), skipped=skipped)
+    print(f"{len(pending)} scenarios to generate, {skipped} already in catalog")
+    if not pending:
+        return stats
+
+    if not await check_ollama_health():
+        raise OllamaError("Ollama n'est pas disponible. Démarrez-le avec 'ollama serve'.")
+
+    budget = coordination.llm_slot_count()
+    if concurrency > budget:
+        print(f"Concurrency {concurrency} capped at the shared LLM budget of {budget} slots")
+    semaphore = asyncio.Semaphore(concurrency)
+    tts_pool = ProcessPoolExecutor(max_workers=tts_workers) if tts_workers > 0 else None
+    try:
+        await asyncio.gather(*[
+            generate_one(country, year, semaphore, tts_pool, stats)
+            for country, year in pending
+        ])
+    finally:
+        if tts_pool is not None:
+            tts_pool.shutdown()
+    return stats
+
+
+def parse_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate the scenario catalog")
+    parser.add_argument("--countries", type=parse_list, default=DEFAULT_COUNTRIES,
+                        help="Comma-separated country names")
+    parser.add_argument("--years", type=lambda v: [int(y) for y in parse_list(v)], default=DEFAULT_YEARS,
+                        help="Comma-separated starting years")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent Ollama generations")
+    parser.add_argument("--tts", action="store_true", help="Pre-synthesize each opening narrative")
+    parser.add_argument("--tts-workers", type=int, default=2, help="Processes used for TTS synthesis")
+    args = parser.parse_args()
+
+    stats = asyncio.run(run(
+        args.countries,
+        args.years,
+        max(1, args.concurrency),
+        max(1, args.tts_workers) if args.tts else 0
+    ))
+    elapsed = time.perf_counter() - stats.started
+    print(
+        f"Done in {elapsed:.1f}s: {stats.done} generated, {stats.failed} failed, "
+        f"{stats.skipped} skipped, {stats.audio} narrations synthesized"
+    )
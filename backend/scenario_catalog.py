@@ -0,0 +1,33 @@
+"""
+Scenario catalog
+Pre-generated starting situations read by start_game before calling Ollama
+"""
+import hashlib
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from models import Scenario
+
+
+def narrative_hash(text: str) -> str:
+    """Stable key used to find pre-synthesized audio for a narrative"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_catalog_situation(db: Session, country: str, year: int) -> Optional[Dict[str, Any]]:
+    """Return the pre-generated situation for a start point, if any"""
+    row = db.query(Scenario.situation).filter(
+        Scenario.country == country,
+        Scenario.year == year
+    ).first()
+    return row.situation if row else None
+
+
+def get_catalog_audio(db: Session, text: str) -> Optional[bytes]:
+    """Return pre-synthesized WAV audio for an opening narrative, if any"""
+    scenario = db.query(Scenario).filter(
+        Scenario.narrative_hash == narrative_hash(text),
+        Scenario.narrative_audio.isnot(None)
+    ).first()
+    return scenario.narrative_audio if scenario else None
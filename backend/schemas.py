@@ -15,6 +15,7 @@ class StartGameRequest(BaseModel):
 class MakeDecisionRequest(BaseModel):
     game_id: int
     choice_index: int
+    expected_version: Optional[int] = None
 
 
 # ========== Response Schemas ==========
@@ -40,6 +41,7 @@ class GameStateResponse(BaseModel):
     stats: StatsResponse
     narrative: str
     choices: List[ChoiceOption]
+    version: Optional[int] = None
     
 
 class StartGameResponse(BaseModel):
@@ -0,0 +1,240 @@
+"""
+Headless auto-play simulator for throughput and balance testing.
+
+Plays N games concurrently through the real /start_game and /make_decision
+endpoints (in-process, no browser or HTTP server needed). Choices are made by a
+pluggable policy, each game's stat trajectory is streamed to a columnar file as
+soon as the game ends, and balance summaries are computed in a process pool.
+
+Point DATABASE_URL at a scratch database: simulated games are stored like real ones.
+
+Usage:
+    python simulate_games.py [--games 20] [--turns 10] [--policy random]
+                             [--concurrency 4] [--output simulation.parquet]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import statistics
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+STAT_NAMES = ["gold", "stability", "army", "population", "diplomacy"]
+RISK_ORDER = {"low": 0, "medium": 1, "high": 2}
+
+DEFAULT_START_POINTS = [
+    ("France", "FRA", 1789), ("Germany", "DEU", 1871), ("United Kingdom", "GBR", 1815),
+    ("Japan", "JPN", 1868), ("China", "CHN", 1644), ("Russia", "RUS", 1914),
+]
+
+
+# ===== CHOICE POLICIES =====
+
+def random_policy(choices: List[dict], stats: Dict[str, int], rng: random.Random) -> int:
+    return rng.randrange(len(choices))
+
+
+def risk_seeking_policy(choices: List[dict], stats: Dict[str, int], rng: random.Random) -> int:
+    return max(range(len(choices)), key=lambda i: (RISK_ORDER.get(choices[i].get("risk_level"), 1), rng.random()))
+
+
+def cautious_policy(choices: List[dict], stats: Dict[str, int], rng: random.Random) -> int:
+    return min(range(len(choices)), key=lambda i: (RISK_ORDER.get(choices[i].get("risk_level"), 1), rng.random()))
+
+
+POLICIES: Dict[str, Callable[[List[dict], Dict[str, int], random.Random], int]] = {
+    "random": random_policy,
+    "risk_seeking": risk_seeking_policy,
+    "cautious": cautious_policy,
+}
+
+
+# ===== TRAJECTORY OUTPUT =====
+
+class TrajectoryWriter:
+    """
+    Streams one columnar record per game.
+    Writes Parquet (one row group per game) when pyarrow is installed,
+    otherwise gzip-compressed NDJSON where each line holds the game's columns.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._parquet = None
+        self._file = None
+        if path.endswith(".parquet"):
+            try:
+                import pyarrow
+                import pyarrow.parquet
+                self._pa = pyarrow
+                self._pq = pyarrow.parquet
+                self._parquet = True
+            except ImportError:
+                self.path = path[:-len(".parquet")] + ".ndjson.gz"
+                print(f"pyarrow not installed, writing {self.path} instead")
+        if not self._parquet:
+            self._file = gzip.open(self.path, "wt", encoding="utf-8")
+
+    def write(self, columns: Dict[str, list]) -> None:
+        if self._parquet:
+            table = self._pa.table(columns)
+            if self._file is None:
+                self._file = self._pq.ParquetWriter(self.path, table.schema, compression="zstd")
+            self._file.write_table(table)
+        else:
+            self._file.write(json.dumps(columns, separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+# ===== BALANCE ANALYSIS (runs in worker processes) =====
+
+def summarize_trajectory(columns: Dict[str, list]) -> Dict[str, Any]:
+    """Per-game drift of each stat between the first and last turn"""
+    summary = {"game_id": columns["game_id"][0], "turns": len(columns["turn"]) - 1}
+    for stat in STAT_NAMES:
+        values = columns[stat]
+        deltas = [b - a for a, b in zip(values, values[1:])]
+        summary[f"{stat}_drift"] = values[-1] - values[0]
+        summary[f"{stat}_mean_delta"] = statistics.fmean(deltas) if deltas else 0.0
+    return summary
+
+
+# ===== SIMULATION =====
+
+class SimulationStats:
+    def __init__(self):
+        self.games_done = 0
+        self.games_failed = 0
+        self.turn_latencies: List[float] = []
+        self.started = time.perf_counter()
+
+
+async def play_game(
+    client: httpx.AsyncClient,
+    start_point: tuple,
+    turns: int,
+    policy: Callable,
+    rng: random.Random,
+    stats: SimulationStats
+) -> Optional[Dict[str, list]]:
+    country, country_code, year = start_point
+    # A unique key per game: concurrent games on the same start point must not
+    # be coalesced into one by the single-flight on start_game
+    response = (await client.post("/start_game", json={
+        "country": country, "country_code": country_code, "year": year
+    }, headers={"Idempotency-Key": f"sim-start-{uuid.uuid4().hex}"})).json()
+    if not response.get("success"):
+        print(f"start_game failed for {country} {year}: {response.get('error')}")
+        return None
+
+    game = response["game"]
+    columns: Dict[str, list] = {"game_id": [], "turn": [], "year": [], "choice": [], "risk": []}
+    columns.update({stat: [] for stat in STAT_NAMES})
+
+    def record(turn: int, choice: Optional[int], risk: Optional[str]) -> None:
+        columns["game_id"].append(game["game_id"])
+        columns["turn"].append(turn)
+        columns["year"].append(game["current_date"])
+        columns["choice"].append(choice if choice is not None else -1)
+        columns["risk"].append(risk or "")
+        for stat in STAT_NAMES:
+            columns[stat].append(game["stats"][stat])
+
+    record(0, None, None)
+    for turn in range(1, turns + 1):
+        if not game["choices"]:
+            break
+        index = policy(game["choices"], game["stats"], rng)
+        choice = game["choices"][index]
+        started = time.perf_counter()
+        response = (await client.post(
+            "/make_decision",
+            json={"game_id": game["game_id"], "choice_index": choice["index"], "expected_version": game["version"]},
+            headers={"Idempotency-Key": f"sim-decision-{uuid.uuid4().hex}"}
+        )).json()
+        if not response.get("success"):
+            # A game cut short is a failed game, not a shorter trajectory
+            print(f"make_decision failed for game {game['game_id']}: {response.get('error')}")
+            return None
+        stats.turn_latencies.append(time.perf_counter() - started)
+        game = response["game"]
+        record(turn, choice["index"], choice.get("risk_level"))
+    return columns
+
+
+async def run(games: int, turns: int, policy_name: str, concurrency: int, output: str, seed: int) -> None:
+    # Imported here so DATABASE_URL from the environment is applied first
+    from main import app
+    from migrate import migrate
+    migrate()
+
+    policy = POLICIES[policy_name]
+    stats = SimulationStats()
+    writer = TrajectoryWriter(output)
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    summaries = []
+
+    async def one(i: int, client: httpx.AsyncClient, pool: ProcessPoolExecutor) -> None:
+        async with semaphore:
+            rng = random.Random(seed + i)
+            try:
+                columns = await play_game(client, DEFAULT_START_POINTS[i % len(DEFAULT_START_POINTS)],
+                                          turns, policy, rng, stats)
+            except Exception as e:
+                print(f"Game {i} crashed: {e}")
+                columns = None
+        if not columns:
+            stats.games_failed += 1
+            return
+        writer.write(columns)
+        summaries.append(await loop.run_in_executor(pool, summarize_trajectory, columns))
+        stats.games_done += 1
+        elapsed = time.perf_counter() - stats.started
+        print(f"[{stats.games_done + stats.games_failed}/{games}] game done | "
+              f"{len(stats.turn_latencies) / elapsed:.2f} turns/s")
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        with ProcessPoolExecutor() as pool:
+            async with httpx.AsyncClient(transport=transport, base_url="http://simulator", timeout=None) as client:
+                await asyncio.gather(*[one(i, client, pool) for i in range(games)])
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - stats.started
+    latencies = sorted(stats.turn_latencies)
+    print(f"\n{stats.games_done} games played, {stats.games_failed} failed in {elapsed:.1f}s "
+          f"-> trajectories in {writer.path}")
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"Throughput: {len(latencies) / elapsed:.2f} turns/s | "
+              f"turn latency p50={statistics.median(latencies):.2f}s p95={p95:.2f}s")
+    if summaries:
+        print(f"Balance drift ({policy_name}, mean over games):")
+        for stat in STAT_NAMES:
+            drift = statistics.fmean(s[f"{stat}_drift"] for s in summaries)
+            per_turn = statistics.fmean(s[f"{stat}_mean_delta"] for s in summaries)
+            print(f"  {stat:<11} total {drift:+.1f} | per turn {per_turn:+.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play games headlessly for throughput and balance testing")
+    parser.add_argument("--games", type=int, default=20, help="Number of games to play")
+    parser.add_argument("--turns", type=int, default=10, help="Decisions per game")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random", help="Choice policy")
+    parser.add_argument("--concurrency", type=int, default=4, help="Games played at the same time")
+    parser.add_argument("--output", default="simulation.parquet", help="Trajectory file (.parquet or .ndjson.gz)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the policies")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.games, args.turns, args.policy, max(1, args.concurrency), args.output, args.seed))
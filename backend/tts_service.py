@@ -13,6 +13,25 @@ from pathlib import Path
 TTS_MODEL_DIR = Path(__file__).parent / "tts_models"
 FRENCH_MODEL = TTS_MODEL_DIR / "fr_FR-siwis-medium.onnx"
 
+# Loaded voice, shared by all requests
+_voice = None
+
+
+def load_voice():
+    """
+    Load the Piper voice once and keep it in memory.
+    Raises if piper-tts or the model is not available.
+    """
+    global _voice
+    if _voice is None:
+        from piper import PiperVoice
+        
+        if not FRENCH_MODEL.exists():
+            raise FileNotFoundError(f"Model not found: {FRENCH_MODEL}")
+        
+        _voice = PiperVoice.load(str(FRENCH_MODEL))
+    return _voice
+
 
 def generate_speech(text: str) -> bytes:
     """
@@ -74,13 +93,8 @@ def generate_speech_python(text: str) -> bytes:
     Returns WAV audio bytes.
     """
     try:
-        from piper import PiperVoice
-        
-        if not FRENCH_MODEL.exists():
-            raise FileNotFoundError(f"Model not found: {FRENCH_MODEL}")
-        
-        # Load voice
-        voice = PiperVoice.load(str(FRENCH_MODEL))
+        # Load voice (cached after the first call)
+        voice = load_voice()
         
         # Generate audio samples
         audio_samples = []
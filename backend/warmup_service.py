@@ -0,0 +1,98 @@
+"""
+Startup warm-up and readiness tracking.
+
+The API starts listening immediately (liveness), while the database pool,
+the Piper voice and the Ollama model are warmed in parallel in the background.
+/readyz only reports ready once the components needed to serve a turn are warm.
+"""
+import asyncio
+import time
+from typing import Any, Dict
+
+from sqlalchemy import text
+
+from database import engine
+from migrate import schema_is_current
+from ollama_service import warm_up_model
+from tts_service import load_voice
+
+# Components that must be warm before the instance accepts traffic
+REQUIRED_COMPONENTS = ("database", "ollama")
+
+
+class WarmupState:
+    """Warm-up status and timings of each component"""
+
+    def __init__(self):
+        self.components: Dict[str, Dict[str, Any]] = {
+            name: {"ready": False, "seconds": None, "error": None}
+            for name in ("database", "tts", "ollama")
+        }
+        self.import_seconds: float = 0.0
+        self.startup_seconds: float = None
+
+    @property
+    def ready(self) -> bool:
+        return all(self.components[name]["ready"] for name in REQUIRED_COMPONENTS)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "import_seconds": round(self.import_seconds, 3),
+            "startup_seconds": round(self.startup_seconds, 3) if self.startup_seconds is not None else None,
+            "components": self.components,
+        }
+
+
+state = WarmupState()
+
+
+def warm_database() -> None:
+    """Fill the connection pool and check migrations have been applied"""
+    if not schema_is_current():
+        raise RuntimeError("Schema not up to date, run 'python migrate.py'")
+    pool_size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    connections = [engine.connect() for _ in range(pool_size)]
+    try:
+        for conn in connections:
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+async def _warm(name: str, func) -> None:
+    started = time.perf_counter()
+    try:
+        if asyncio.iscoroutinefunction(func):
+            await func()
+        else:
+            await asyncio.to_thread(func)
+        state.components[name]["ready"] = True
+        state.components[name]["error"] = None
+    except Exception as e:
+        state.components[name]["error"] = str(e)
+    state.components[name]["seconds"] = round(time.perf_counter() - started, 3)
+
+
+async def warm_up(process_started: float) -> None:
+    """Warm every component in parallel and record the total startup time"""
+    await asyncio.gather(
+        _warm("database", warm_database),
+        _warm("tts", load_voice),
+        _warm("ollama", warm_up_model),
+    )
+    state.startup_seconds = time.perf_counter() - process_started
+    print(f"Warm-up finished: {state.as_dict()}")
+    await retry_failed()
+
+
+async def retry_failed(interval: float = 10.0) -> None:
+    """Keep retrying required components that were not available at startup"""
+    while not state.ready:
+        await asyncio.sleep(interval)
+        await asyncio.gather(*[
+            _warm(name, {"database": warm_database, "ollama": warm_up_model}[name])
+            for name in REQUIRED_COMPONENTS
+            if not state.components[name]["ready"]
+        ])
@@ -74,7 +74,7 @@ function App() {
     setLoading(true);
     setError(null);
 
-    const response = await makeDecision(gameState.game_id, choiceIndex);
+    const response = await makeDecision(gameState.game_id, choiceIndex, gameState.version);
 
     setLoading(false);
 
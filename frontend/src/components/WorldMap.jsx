@@ -1,22 +1,54 @@
 import { useEffect, useState, useRef } from 'react';
-import { MapContainer, GeoJSON, TileLayer } from 'react-leaflet';
+import { MapContainer, GeoJSON, TileLayer, useMapEvents } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
+import api from '../services/api';
 
-// We'll fetch GeoJSON from a reliable CDN
+// Full-resolution fallback when the backend map data is not available
 const GEOJSON_URL = 'https://raw.githubusercontent.com/datasets/geo-countries/master/data/countries.geojson';
 
+// Level of detail served by the backend for a given zoom
+const levelForZoom = (zoom) => (zoom >= 5 ? 'high' : zoom >= 4 ? 'medium' : 'low');
+
+// Reports zoom changes so a more detailed level can be loaded
+function ZoomWatcher({ onZoom }) {
+    useMapEvents({
+        zoomend: (e) => onZoom(e.target.getZoom()),
+    });
+    return null;
+}
+
 function WorldMap({ onCountrySelect, selectedCountry }) {
     const [countriesData, setCountriesData] = useState(null);
+    const [level, setLevel] = useState('low');
+    const [loadedLevel, setLoadedLevel] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const geoJsonRef = useRef();
+    const levelsCache = useRef({});
+    // Full-resolution GeoJSON used when the backend has no map data: fetched once, shared by every level
+    const remoteFallback = useRef(null);
 
     useEffect(() => {
-        // Fetch GeoJSON data
-        fetch(GEOJSON_URL)
-            .then((res) => res.json())
+        // Reuse a level already downloaded during this session
+        if (levelsCache.current[level]) {
+            setCountriesData(levelsCache.current[level]);
+            setLoadedLevel(level);
+            return;
+        }
+
+        api.get(`/map/countries/${level}`)
+            .then((res) => res.data)
+            .catch((err) => {
+                if (!remoteFallback.current) {
+                    console.warn('Backend map unavailable, using full GeoJSON:', err);
+                    remoteFallback.current = fetch(GEOJSON_URL).then((res) => res.json());
+                }
+                return remoteFallback.current;
+            })
             .then((data) => {
+                levelsCache.current[level] = data;
                 setCountriesData(data);
+                setLoadedLevel(level);
                 setLoading(false);
             })
             .catch((err) => {
@@ -24,7 +56,7 @@ function WorldMap({ onCountrySelect, selectedCountry }) {
                 setError('Erreur de chargement de la carte');
                 setLoading(false);
             });
-    }, []);
+    }, [level]);
 
     // Style for countries
     const countryStyle = (feature) => {
@@ -63,7 +95,7 @@ function WorldMap({ onCountrySelect, selectedCountry }) {
         // GeoJSON properties can vary - try different common property names
         const props = feature.properties;
         const countryName = props.ADMIN || props.name || props.NAME || props.sovereignt || 'Unknown';
-        const countryCode = props.ISO_A3 !== '-99' ? props.ISO_A3 : (props.ISO_A2 || props.iso_a3 || props.iso_a2 || countryName.substring(0, 3).toUpperCase());
+        const countryCode = props.ISO_A3 && props.ISO_A3 !== '-99' ? props.ISO_A3 : (props.ISO_A2 || props.iso_a3 || props.iso_a2 || countryName.substring(0, 3).toUpperCase());
 
         layer.on({
             mouseover: highlightFeature,
@@ -120,6 +152,7 @@ function WorldMap({ onCountrySelect, selectedCountry }) {
                 minZoom={2}
                 maxZoom={6}
                 scrollWheelZoom={true}
+                preferCanvas={true}
                 className="w-full h-full"
                 style={{ background: '#0d1b2a' }}
             >
@@ -127,8 +160,10 @@ function WorldMap({ onCountrySelect, selectedCountry }) {
                     attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OSM</a>'
                     url="https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png"
                 />
+                <ZoomWatcher onZoom={(zoom) => setLevel(levelForZoom(zoom))} />
                 {countriesData && (
                     <GeoJSON
+                        key={loadedLevel}
                         ref={geoJsonRef}
                         data={countriesData}
                         style={countryStyle}
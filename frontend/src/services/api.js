@@ -9,6 +9,15 @@ const api = axios.create({
     },
 });
 
+// Send the session token so the backend knows the player without a DB lookup
+api.interceptors.request.use((config) => {
+    const token = localStorage.getItem('token');
+    if (token) {
+        config.headers.Authorization = `Bearer ${token}`;
+    }
+    return config;
+});
+
 /**
  * Check if Ollama is available
  */
@@ -48,13 +57,25 @@ export const startGame = async (country, countryCode, year) => {
  * Make a decision in the game
  * @param {number} gameId - Game ID
  * @param {number} choiceIndex - Selected choice index
+ * @param {number} version - Game version the decision is based on
  */
-export const makeDecision = async (gameId, choiceIndex) => {
+// One random key per attempted turn, reused only when that same turn is retried
+const decisionKeys = new Map();
+
+export const makeDecision = async (gameId, choiceIndex, version) => {
+    const turn = `${gameId}:${version}:${choiceIndex}`;
+    if (!decisionKeys.has(turn)) {
+        decisionKeys.set(turn, crypto.randomUUID());
+    }
     try {
         const response = await api.post('/make_decision', {
             game_id: gameId,
             choice_index: choiceIndex,
-        });
+            expected_version: version,
+        }, { headers: { 'Idempotency-Key': decisionKeys.get(turn) } });
+        if (response.data?.success) {
+            decisionKeys.delete(turn);
+        }
         return response.data;
     } catch (error) {
         console.error('Error making decision:', error);